@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+from urllib.parse import urlparse
+
+from productsearchengine import ProductSearchEngine
+from searchprofiler import SEARCH_STAGES
+
+# Queries replayed against every catalog
+BENCHMARK_QUERIES = [
+    "Box of Chocolate Candy",
+    "comfortable footbed",
+    "Available in black, red, nude, and silver",
+    "Cat-Ear Beanie america",
+    "energy potion",
+    "leather sneakers swiss",
+    "dark red",
+    "made in korea",
+    "hiking boots",
+    "gamefuel"
+]
+SEARCH_MODES = ['any', 'all', 'exact']
+
+
+def build_synthetic_catalog(copies: int, output_directory: str,
+                            index_directory: str = "indexs/", data_directory: str = "data/") -> None:
+    """Build a catalog `copies` times larger than the real one, each copy on its own domain.
+
+    Products and index entries are duplicated under shop<i>.example URLs, so the
+    synthetic indexes have exactly the structure of the real ones.
+    """
+    def remap(url: str, copy: int) -> str:
+        return urlparse(url)._replace(netloc=f"shop{copy}.example").geturl()
+
+    os.makedirs(os.path.join(output_directory, "data"), exist_ok=True)
+    os.makedirs(os.path.join(output_directory, "indexs"), exist_ok=True)
+    shutil.copy(f"{data_directory}origin_synonyms.json", os.path.join(output_directory, "data"))
+
+    with open(f"{data_directory}rearranged_products.jsonl", "r") as f:
+        products = [json.loads(line) for line in f]
+    with open(os.path.join(output_directory, "data", "rearranged_products.jsonl"), "w") as f:
+        for copy in range(copies):
+            for product in products:
+                f.write(json.dumps(dict(product, url=remap(product["url"], copy))) + "\n")
+
+    for name in ("title_index", "description_index"):
+        with open(f"{index_directory}{name}.json", "r") as f:
+            index = json.load(f)
+        synthetic_index = {
+            token: {remap(url, copy): positions for copy in range(copies) for url, positions in postings.items()}
+            for token, postings in index.items()
+        }
+        with open(os.path.join(output_directory, "indexs", f"{name}.json"), "w") as f:
+            json.dump(synthetic_index, f)
+
+    for name in ("brand_index", "origin_index"):
+        with open(f"{index_directory}{name}.json", "r") as f:
+            index = json.load(f)
+        synthetic_index = {
+            token: [remap(url, copy) for copy in range(copies) for url in urls]
+            for token, urls in index.items()
+        }
+        with open(os.path.join(output_directory, "indexs", f"{name}.json"), "w") as f:
+            json.dump(synthetic_index, f)
+
+    with open(f"{index_directory}reviews_index.json", "r") as f:
+        reviews_index = json.load(f)
+    with open(os.path.join(output_directory, "indexs", "reviews_index.json"), "w") as f:
+        json.dump({remap(url, copy): review_data for copy in range(copies)
+                   for url, review_data in reviews_index.items()}, f)
+
+    # Domain keys follow the real index: the host name without punctuation
+    with open(os.path.join(output_directory, "indexs", "domain_index.json"), "w") as f:
+        json.dump({f"shop{copy}example": [remap(product["url"], copy) for product in products]
+                   for copy in range(copies)}, f)
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_benchmark(search_engine: ProductSearchEngine, queries: List[str],
+                  search_modes: List[str], repeats: int = 3) -> Dict[str, Dict]:
+    """Replay the queries in each search mode and report latency percentiles, throughput and stage costs.
+
+    Latencies are measured without profiling so they do not include its overhead; a
+    separate profiled pass per mode then gives the per-stage breakdown.
+    """
+    report = {}
+    for search_mode in search_modes:
+        # Warm up once so the first query does not skew the percentiles
+        search_engine.execute_search(queries[0], search_mode=search_mode)
+        latencies_ms = []
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for query in queries:
+                query_started = time.perf_counter()
+                search_engine.execute_search(query, search_mode=search_mode)
+                latencies_ms.append((time.perf_counter() - query_started) * 1000)
+        elapsed = time.perf_counter() - started
+        latencies_ms.sort()
+        report[search_mode] = {
+            "queries": len(latencies_ms),
+            "p50_ms": percentile(latencies_ms, 50),
+            "p95_ms": percentile(latencies_ms, 95),
+            "p99_ms": percentile(latencies_ms, 99),
+            "qps": len(latencies_ms) / elapsed
+        }
+
+        search_engine.profiler.reset()
+        for _ in range(repeats):
+            for query in queries:
+                search_engine.execute_search(query, search_mode=search_mode, profile=True)
+        report[search_mode]["stages"] = search_engine.profiler.summary()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ProductSearchEngine on synthetic catalogs.")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 4, 16],
+                        help="Catalog sizes, as multiples of the real catalog")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Optional JSON file for the full report")
+    args = parser.parse_args()
+
+    full_report = []
+    for copies in args.copies:
+        with tempfile.TemporaryDirectory() as catalog_directory:
+            build_synthetic_catalog(copies, catalog_directory)
+            search_engine = ProductSearchEngine(os.path.join(catalog_directory, "indexs/"),
+                                                os.path.join(catalog_directory, "data/"))
+            report = run_benchmark(search_engine, BENCHMARK_QUERIES, SEARCH_MODES, args.repeats)
+
+        print(f"\nCatalog: {len(search_engine.products)} products ({copies}x)")
+        print(f"{'mode':<8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'QPS':>10}")
+        for search_mode, stats in report.items():
+            print(f"{search_mode:<8}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['qps']:>10.1f}")
+        for search_mode, stats in report.items():
+            print(f"Stage p95 (ms), {search_mode}: " + ", ".join(
+                f"{stage} {stats['stages']['timings_ms'][stage]['p95']:.3f}" for stage in SEARCH_STAGES))
+        full_report.append({"products": len(search_engine.products), "copies": copies, "modes": report})
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(full_report, f, indent=2)
@@ -0,0 +1,71 @@
+import json
+import os
+import sys
+from array import array
+from typing import Dict, Iterator, Optional
+
+
+class DocumentStore:
+    def __init__(self, products_path: str):
+        """Load the fields used for ranking into columns indexed by document ID.
+
+        Only the URL, title, description, brand and "made in" origin are kept in memory,
+        as interned strings (product variants share most of their text). Full records,
+        with links and reviews, are read back from the JSONL file on demand using the
+        byte offset of each line.
+        """
+        self.products_path = products_path
+        self.doc_ids = {}
+        self.urls = []
+        self.titles = []
+        self.descriptions = []
+        self.brands = []
+        self.origins = []
+        self.offsets = array('q')
+
+        with open(products_path, "rb") as f:
+            # Offsets are only valid for this version of the file, so remember which one it was
+            stat = os.fstat(f.fileno())
+            self.file_signature = (stat.st_size, stat.st_mtime_ns)
+            offset = 0
+            for line in f:
+                line_offset = offset
+                offset += len(line)
+                if not line.strip():
+                    continue
+                product = json.loads(line)
+                features = product.get('product_features', {})
+                self.doc_ids[product['url']] = len(self.urls)
+                self.urls.append(sys.intern(product['url']))
+                self.titles.append(sys.intern(product['title']))
+                self.descriptions.append(sys.intern(product.get('description', '')))
+                self.brands.append(self._intern_optional(product.get('brand')))
+                self.origins.append(self._intern_optional(features.get('made in')))
+                self.offsets.append(line_offset)
+
+    @staticmethod
+    def _intern_optional(value: Optional[str]) -> Optional[str]:
+        return sys.intern(value) if value is not None else None
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.doc_ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.urls)
+
+    def __getitem__(self, url: str) -> Dict:
+        """Read the full product record of a URL from the JSONL file.
+
+        Raises RuntimeError if the file was rewritten since it was loaded, since the
+        stored offsets would then point into different records.
+        """
+        with open(self.products_path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if (stat.st_size, stat.st_mtime_ns) != self.file_signature:
+                raise RuntimeError(f"{self.products_path} changed since it was loaded; "
+                                   f"reload the search engine to read full product records")
+            f.seek(self.offsets[self.doc_ids[url]])
+            return json.loads(f.readline())
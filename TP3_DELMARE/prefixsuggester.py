@@ -0,0 +1,116 @@
+import bisect
+import heapq
+from array import array
+from typing import Dict, Iterable, List, Set
+
+# Sorts after every character a term can contain, to bound prefix ranges
+_PREFIX_END = "\uffff"
+
+
+def prefix_edit_distance(prefix: str, term: str, max_distance: int) -> int:
+    """Return the smallest edit distance between `prefix` and any prefix of `term`.
+
+    Stops early and returns max_distance + 1 once the distance is known to exceed max_distance.
+    """
+    previous_row = list(range(len(prefix) + 1))
+    best = previous_row[-1]
+    for j, term_char in enumerate(term, 1):
+        current_row = [j]
+        for i, prefix_char in enumerate(prefix, 1):
+            current_row.append(min(previous_row[i] + 1, current_row[i - 1] + 1,
+                                   previous_row[i - 1] + (prefix_char != term_char)))
+        best = min(best, current_row[-1])
+        if min(current_row) > max_distance:
+            break
+        previous_row = current_row
+    return best if best <= max_distance else max_distance + 1
+
+
+class PrefixSuggester:
+    def __init__(self, term_documents: Dict[str, Set[str]], review_scores: Dict[str, float],
+                 cached_prefix_length: int = 2, cached_suggestions: int = 10):
+        """Build a sorted term array with per-term document frequency and mean review score.
+
+        The top completions of every prefix of up to `cached_prefix_length` characters are
+        precomputed, since those prefixes match the largest share of the vocabulary.
+        """
+        self.terms = sorted(term_documents)
+        self.document_frequencies = array('I', (len(term_documents[term]) for term in self.terms))
+        self.review_scores = array('d')
+        for term in self.terms:
+            documents = term_documents[term]
+            self.review_scores.append(
+                sum(review_scores.get(url, 0) for url in documents) / len(documents) if documents else 0.0)
+
+        # Popularity rank of each term: most documents first, then best reviewed, then alphabetical
+        by_popularity = sorted(range(len(self.terms)),
+                               key=lambda i: (-self.document_frequencies[i], -self.review_scores[i], self.terms[i]))
+        self.ranks = array('I', bytes(4 * len(self.terms)))
+        for rank, i in enumerate(by_popularity):
+            self.ranks[i] = rank
+
+        self.cached_suggestions = cached_suggestions
+        self.prefix_cache = {}
+        for length in range(1, cached_prefix_length + 1):
+            for prefix in {term[:length] for term in self.terms if len(term) >= length}:
+                self.prefix_cache[prefix] = self._top_positions(prefix, cached_suggestions)
+
+    @classmethod
+    def from_indexes(cls, indexes: Iterable[Dict], reviews_index: Dict[str, Dict]) -> "PrefixSuggester":
+        """Build the suggester from term -> postings indexes (dicts or lists of URLs)."""
+        term_documents = {}
+        for index in indexes:
+            for term, postings in index.items():
+                term_documents.setdefault(term, set()).update(postings)
+        review_scores = {url: data['mean_mark'] for url, data in reviews_index.items()}
+        return cls(term_documents, review_scores)
+
+    def _prefix_range(self, prefix: str) -> range:
+        """Return the positions of the sorted terms starting with `prefix`."""
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + _PREFIX_END, start)
+        return range(start, end)
+
+    def _top_positions(self, prefix: str, limit: int) -> List[int]:
+        """Return the positions of the `limit` most popular terms starting with `prefix`."""
+        positions = self._prefix_range(prefix)
+        if len(positions) <= limit:
+            return sorted(positions, key=self.ranks.__getitem__)
+        return heapq.nsmallest(limit, positions, key=self.ranks.__getitem__)
+
+    def _suggestion(self, position: int) -> Dict:
+        return {
+            "term": self.terms[position],
+            "document_frequency": self.document_frequencies[position],
+            "review_score": self.review_scores[position]
+        }
+
+    def suggest(self, prefix: str, limit: int = 10, max_typos: int = 0) -> List[Dict]:
+        """Return up to `limit` completions of `prefix`, most popular first.
+
+        With max_typos > 0, terms whose beginning is within that edit distance of the
+        prefix are appended after the exact completions, closest first. Typo-tolerant
+        matching scans the terms sharing the prefix's first letter, so it is slower.
+        """
+        prefix = prefix.lower().lstrip()
+        if not prefix or limit <= 0:
+            return []
+
+        if prefix in self.prefix_cache and limit <= self.cached_suggestions:
+            positions = self.prefix_cache[prefix][:limit]
+        else:
+            positions = self._top_positions(prefix, limit)
+
+        if max_typos > 0 and len(positions) < limit:
+            exact_positions = set(positions)
+            fuzzy_matches = []
+            for position in self._prefix_range(prefix[0]):
+                if position in exact_positions:
+                    continue
+                distance = prefix_edit_distance(prefix, self.terms[position], max_typos)
+                if distance <= max_typos:
+                    fuzzy_matches.append((distance, self.ranks[position], position))
+            positions = positions + [position for _, _, position in
+                                     heapq.nsmallest(limit - len(positions), fuzzy_matches)]
+
+        return [self._suggestion(position) for position in positions]
@@ -1,19 +1,30 @@
 import json
 import math
-import re
 import os
 import string
-from datetime import datetime
-from typing import Dict, List, Set, Tuple
+import time
+from typing import Dict, List, Optional, Set, Tuple
 import nltk
 from nltk.corpus import stopwords
 
+from documentstore import DocumentStore
+from prefixsuggester import PrefixSuggester
+from querylogwriter import QueryLogWriter
+from searchprofiler import SearchProfiler
+
 nltk.download("stopwords")
 # STOPWORDS
 STOPWORDS = stopwords.words("english")
 
+
+def ranking_sort_key(item: Tuple[str, Dict[str, float]]) -> Tuple[float, str]:
+    """Order (url, scores) pairs by decreasing final score, then by URL for a stable order."""
+    return -item[1]['final_score'], item[0]
+
+
 class ProductSearchEngine:
-    def __init__(self, index_directory: str = "indexs/"):
+    def __init__(self, index_directory: str = "indexs/", data_directory: str = "data/",
+                 query_log: Optional[QueryLogWriter] = None):
         """Initialize the search engine by loading required indexes and product data."""
         # Load all indexes from the specified directory
         with open(f"{index_directory}brand_index.json", "r") as f:
@@ -24,24 +35,38 @@ class ProductSearchEngine:
             self.domain_index = json.load(f)
         with open(f"{index_directory}origin_index.json", "r") as f:
             self.origin_index = json.load(f)
-        with open(f"data/origin_synonyms.json", "r") as f:
+        with open(f"{data_directory}origin_synonyms.json", "r") as f:
             self.origin_synonyms = json.load(f)
         with open(f"{index_directory}reviews_index.json", "r") as f:
             self.reviews_index = json.load(f)
         with open(f"{index_directory}title_index.json", "r") as f:
             self.title_index = json.load(f)
 
-        # Load product data
-        self.products = {}
-        with open(f"data/rearranged_products.jsonl", "r") as f:
-            for line in f:
-                product = json.loads(line)
-                self.products[product["url"]] = product
+        # Load the product fields used for ranking; full records are read on demand
+        self.products = DocumentStore(f"{data_directory}rearranged_products.jsonl")
 
-        # Create a directory to store search results if it doesn't exist
+        # BM25 corpus statistics; shards of a partitioned catalog ship the global ones
+        self.corpus_size = len(self.products)
+        self.document_frequencies = None
+        statistics_path = f"{index_directory}corpus_statistics.json"
+        if os.path.exists(statistics_path):
+            with open(statistics_path, "r") as f:
+                corpus_statistics = json.load(f)
+            self.corpus_size = corpus_statistics["corpus_size"]
+            self.document_frequencies = corpus_statistics["document_frequencies"]
+
+        # Search results are appended in batches to a query log in the results directory
         base_path = os.path.dirname(index_directory.rstrip('/'))
         self.results_directory = os.path.join(base_path, "search_results")
-        os.makedirs(self.results_directory, exist_ok=True)
+        if query_log is None:
+            query_log = QueryLogWriter(os.path.join(self.results_directory, "queries.jsonl"))
+        self.query_log = query_log
+
+        # Aggregate stage timings of searches run with profile=True
+        self.profiler = SearchProfiler()
+
+        # Typeahead structure over the title, brand and origin vocabularies, built on first use
+        self.suggester = None
 
     def preprocess_text(self, text: str) -> List[str]:
         """Preprocess the text by removing punctuation, replacing synonyms, and removing stopwords."""
@@ -77,7 +102,8 @@ class ProductSearchEngine:
                     enriched_tokens.append(country)
                     enriched_tokens.extend(
                         [s for s in synonyms if s != synonym])
-        return list(set(enriched_tokens))
+        # Sorted so BM25 sums its terms in the same order in every process, whatever the hash seed
+        return sorted(set(enriched_tokens))
 
     def filter_documents_by_any_token(self, query_tokens: List[str]) -> Set[str]:
         """Filter documents that contain at least one of the query tokens."""
@@ -114,25 +140,33 @@ class ProductSearchEngine:
         normalized_query = query.lower().strip()
         matching_documents = set()
 
-        for doc_url, product in self.products.items():
+        products = self.products
+        for doc_id, doc_url in enumerate(products.urls):
+            brand = products.brands[doc_id]
+            origin = products.origins[doc_id]
             # Title match
-            if normalized_query == product['title'].lower().strip():
+            if normalized_query == products.titles[doc_id].lower().strip():
                 matching_documents.add(doc_url)
             # Brand match
-            if 'brand' in product and normalized_query == product['brand'].lower().strip():
+            if brand is not None and normalized_query == brand.lower().strip():
                 matching_documents.add(doc_url)
             # Origin match
-            if 'product_features' in product and 'made in' in product['product_features']:
-                if normalized_query == product['product_features']['made in'].lower().strip():
-                    matching_documents.add(doc_url)
+            if origin is not None and normalized_query == origin.lower().strip():
+                matching_documents.add(doc_url)
 
         return matching_documents
 
+    def document_frequency(self, token: str) -> int:
+        """Return the number of title and description postings for a token."""
+        if self.document_frequencies is not None:
+            return self.document_frequencies.get(token, 0)
+        return len(self.title_index.get(token, {})) + len(self.description_index.get(token, {}))
+
     def calculate_bm25_score(self, doc_url: str, query_tokens: List[str], k1: float = 1.5, b: float = 0.75) -> float:
         """Calculate BM25 score for a given document."""
         score = 0
-        doc = self.products[doc_url]
-        doc_text = f"{doc['title']} {doc['description']}"
+        doc_id = self.products.doc_ids[doc_url]
+        doc_text = f"{self.products.titles[doc_id]} {self.products.descriptions[doc_id]}"
         doc_tokens = self.preprocess_text(doc_text)
 
         # Document length normalization
@@ -144,13 +178,12 @@ class ProductSearchEngine:
             tf = doc_tokens.count(token)
 
             # Calculate inverse document frequency
-            doc_count = len(self.title_index.get(token, {})) + \
-                len(self.description_index.get(token, {}))
+            doc_count = self.document_frequency(token)
             if doc_count == 0:
                 continue
 
             idf = math.log(
-                (len(self.products) - doc_count + 0.5) / (doc_count + 0.5))
+                (self.corpus_size - doc_count + 0.5) / (doc_count + 0.5))
 
             # Calculate BM25 score for this term
             numerator = tf * (k1 + 1)
@@ -164,7 +197,10 @@ class ProductSearchEngine:
                                  review_weight: float = 0.3, title_match_weight: float = 0.2,
                                  origin_match_weight: float = 0.1) -> Dict[str, float]:
         """Calculate the ranking score for a document using multiple criteria with adjustable weights."""
-        doc = self.products[doc_url]
+        doc_id = self.products.doc_ids[doc_url]
+        title = self.products.titles[doc_id]
+        brand = self.products.brands[doc_id]
+        origin = self.products.origins[doc_id]
         scores = {
             'bm25_score': 0,
             'exact_match_score': 0,
@@ -177,10 +213,9 @@ class ProductSearchEngine:
         scores['bm25_score'] = self.calculate_bm25_score(doc_url, query_tokens) * bm25_weight
 
         # 2. Exact match bonus (adjustable weight)
-        if (query.lower().strip() == doc['title'].lower().strip() or
-            ('brand' in doc and query.lower().strip() == doc['brand'].lower().strip()) or
-            ('product_features' in doc and 'made in' in doc['product_features'] and
-             query.lower().strip() == doc['product_features']['made in'].lower().strip())):
+        if (query.lower().strip() == title.lower().strip() or
+            (brand is not None and query.lower().strip() == brand.lower().strip()) or
+            (origin is not None and query.lower().strip() == origin.lower().strip())):
             scores['exact_match_score'] = exact_match_weight
 
         # 3. Review score (adjustable weight)
@@ -191,42 +226,58 @@ class ProductSearchEngine:
             scores['review_score'] = base_review_score * review_weight
 
         # 4. Title match score (adjustable weight)
-        title_tokens = self.preprocess_text(doc['title'])
+        title_tokens = self.preprocess_text(title)
         title_matches = sum(
             1 for token in query_tokens if token in title_tokens)
         scores['title_match_score'] = title_matches * title_match_weight
 
         # 5. Origin match score (adjustable weight)
-        if 'product_features' in doc and 'made in' in doc['product_features']:
-            origin = doc['product_features']['made in'].lower()
-            if origin in query_tokens:
-                scores['origin_match_score'] = origin_match_weight
+        if origin is not None and origin.lower() in query_tokens:
+            scores['origin_match_score'] = origin_match_weight
 
         # Calculate final score
         scores['final_score'] = sum(scores.values())
         return scores
 
+    def suggest(self, prefix: str, limit: int = 10, max_typos: int = 0) -> List[Dict]:
+        """Return completions of a prefix from the title, brand and origin vocabularies.
+
+        Completions are ranked by document frequency, then mean review score.
+        """
+        if self.suggester is None:
+            self.suggester = PrefixSuggester.from_indexes(
+                [self.title_index, self.brand_index, self.origin_index], self.reviews_index)
+        return self.suggester.suggest(prefix, limit, max_typos)
+
     def _save_search_results(self, results: Dict) -> None:
-        """Save the search results to a JSON file."""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        query_slug = re.sub(r'[^a-z0-9]+', '_',
-                            results['metadata']['query'].lower())
-        filename = f"search_{query_slug}_{timestamp}.json"
-        filepath = os.path.join(self.results_directory, filename)
+        """Queue the search results for the background query log writer."""
+        self.query_log.log_search(results)
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+    def close(self) -> None:
+        """Flush pending query log records to disk."""
+        self.query_log.close()
 
     def execute_search(self, query: str, search_mode: str = 'any', save_results: bool = False,
                        bm25_weight: float = 0.4, exact_match_weight: float = 2.0,
                        review_weight: float = 0.3, title_match_weight: float = 0.2,
-                       origin_match_weight: float = 0.1) -> Dict:
-        """Perform a search with adjustable weights for ranking."""
+                       origin_match_weight: float = 0.1, profile: bool = False,
+                       top_k: Optional[int] = None) -> Dict:
+        """Perform a search with adjustable weights for ranking.
+
+        Documents are sorted by decreasing final score, ties broken by URL. With top_k,
+        only the first top_k ranked documents are returned.
+
+        With profile=True, per-stage timings and candidate counts are added to the
+        result metadata and aggregated in self.profiler.
+        """
+        start_time = time.perf_counter()
         # Tokenize and normalize query
         query_tokens = self.preprocess_text(query)
         query_tokens = [
             token for token in query_tokens if token not in STOPWORDS]
+        preprocessed_time = time.perf_counter()
         enriched_tokens = self.enrich_query_with_origin_synonyms(query_tokens)
+        enriched_time = time.perf_counter()
 
         # Get matching documents based on search mode
         if search_mode == 'exact':
@@ -237,6 +288,7 @@ class ProductSearchEngine:
         else:
             matching_documents = self.filter_documents_by_any_token(
                 enriched_tokens)
+        filtered_time = time.perf_counter()
 
         # Rank documents with adjustable weights
         rankings = {}
@@ -244,21 +296,42 @@ class ProductSearchEngine:
             rankings[doc_url] = self.compute_document_ranking(
                 doc_url, query, enriched_tokens, bm25_weight, exact_match_weight,
                 review_weight, title_match_weight, origin_match_weight)
+        ranked_time = time.perf_counter()
 
         # Sort documents by final score
-        sorted_rankings = sorted(
-            rankings.items(), key=lambda item: item[1]['final_score'], reverse=True)
+        sorted_rankings = sorted(rankings.items(), key=ranking_sort_key)
+        if top_k is not None:
+            sorted_rankings = sorted_rankings[:top_k]
+        sorted_time = time.perf_counter()
 
         # Prepare search results
         results = {
             "metadata": {
                 "query": query,
                 "search_mode": search_mode,
-                "document_count": len(sorted_rankings)
+                "document_count": len(rankings)
             },
             "ranked_documents": sorted_rankings
         }
 
+        if profile:
+            timings_ms = {
+                "preprocessing": (preprocessed_time - start_time) * 1000,
+                "synonym_enrichment": (enriched_time - preprocessed_time) * 1000,
+                "candidate_filtering": (filtered_time - enriched_time) * 1000,
+                "ranking": (ranked_time - filtered_time) * 1000,
+                "sorting": (sorted_time - ranked_time) * 1000,
+                "total": (sorted_time - start_time) * 1000
+            }
+            counts = {
+                "query_tokens": len(query_tokens),
+                "enriched_tokens": len(enriched_tokens),
+                "candidates": len(matching_documents)
+            }
+            results["metadata"]["timings_ms"] = timings_ms
+            results["metadata"]["counts"] = counts
+            self.profiler.record(timings_ms, counts)
+
         if save_results:
             self._save_search_results(results)
 
@@ -297,10 +370,14 @@ if __name__ == "__main__":
             
             # Display the top 3 results
             for i, (doc_url, doc_data) in enumerate(results['ranked_documents'][:3], 1):
-                print(f"\n{i}. {search_engine.products[doc_url]['title']} (Score: {doc_data['final_score']:.3f})")
+                # Full records are read from disk, so fetch each one once
+                product = search_engine.products[doc_url]
+                print(f"\n{i}. {product['title']} (Score: {doc_data['final_score']:.3f})")
                 print(f"URL: {doc_url}")
                 for component, score in doc_data.items():
                     if component != 'final_score':
                         print(f"  - {component}: {score:.3f}")
-                if 'description' in search_engine.products[doc_url] and search_engine.products[doc_url]['description']:
-                    print(f"Description: {search_engine.products[doc_url]['description'][:200]}...")
\ No newline at end of file
+                if 'description' in product and product['description']:
+                    print(f"Description: {product['description'][:200]}...")
+
+    search_engine.close()
\ No newline at end of file
@@ -0,0 +1,123 @@
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, List
+
+# Marker telling the background thread to drain the queue and stop
+_STOP = object()
+
+
+class QueryLogWriter:
+    def __init__(self, log_path: str, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_pending: int = 10000, max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 5, compress: bool = False):
+        """Append search records to a rotating JSONL (or gzip) log from a background thread."""
+        self.log_path = f"{log_path}.gz" if compress and not log_path.endswith(".gz") else log_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        # Bounded queue: when the writer falls behind, callers wait instead of growing memory
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.closed = False
+        self.lock = threading.Lock()
+        # Records lost because their batch could not be written
+        self.failed_records = 0
+
+    def write(self, record: Dict) -> None:
+        """Queue a record to be appended to the log, starting the background thread on first use."""
+        # Checking `closed` and queueing under the lock guarantees every accepted record
+        # is ahead of the stop marker that close() queues, so it gets flushed
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("QueryLogWriter is closed")
+            if self.thread is None:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                self.thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+            self.pending.put(record)
+
+    def log_search(self, results: Dict) -> None:
+        """Queue a compact record of a search and its ranked documents."""
+        self.write({
+            "timestamp": datetime.now().isoformat(timespec='milliseconds'),
+            **results['metadata'],
+            "ranked_documents": results['ranked_documents']
+        })
+
+    def _run(self) -> None:
+        """Collect queued records into batches and append them to the log."""
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                record = self.pending.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if record is _STOP:
+                stopping = True
+            else:
+                batch.append(record)
+            # Drain whatever is already waiting, up to the batch size
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    continue
+                batch.append(record)
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    # Never let the thread die: nothing else drains the bounded queue
+                    self.failed_records += len(batch)
+                    logging.error(f"Error writing {len(batch)} records to query log {self.log_path}: {e}")
+
+    def _write_batch(self, batch: List[Dict]) -> None:
+        """Append a batch of records, rotating the log first if it is too large."""
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) >= self.max_bytes:
+            self._rotate()
+        # default=str keeps records with non-JSON values (sets, datetimes...) instead of failing the batch
+        lines = "".join(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str) + "\n"
+                        for record in batch)
+        if self.compress:
+            # Each batch becomes its own gzip member, which gzip readers concatenate transparently
+            with gzip.open(self.log_path, 'at', encoding='utf-8') as f:
+                f.write(lines)
+        else:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+    def _rotate(self) -> None:
+        """Shift log.1 -> log.2 -> ... and move the current log to log.1."""
+        if self.backup_count <= 0:
+            os.remove(self.log_path)
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.log_path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.log_path}.{i + 1}")
+        os.replace(self.log_path, f"{self.log_path}.1")
+
+    def close(self) -> None:
+        """Flush every queued record to disk and stop the background thread."""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            thread = self.thread
+        if thread is not None:
+            self.pending.put(_STOP)
+            thread.join()
+            atexit.unregister(self.close)
@@ -0,0 +1,85 @@
+import bisect
+import threading
+from typing import Dict, List
+
+# Search stages timed by ProductSearchEngine.execute_search, in execution order
+SEARCH_STAGES = ('preprocessing', 'synonym_enrichment', 'candidate_filtering', 'ranking', 'sorting')
+
+
+class Histogram:
+    def __init__(self, bucket_bounds: List[float]):
+        """Initialize a fixed-bucket histogram; values above the last bound go to an overflow bucket."""
+        self.bucket_bounds = bucket_bounds
+        self.bucket_counts = [0] * (len(bucket_bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max_value = 0.0
+
+    def add(self, value: float) -> None:
+        """Record one observation."""
+        self.bucket_counts[bisect.bisect_left(self.bucket_bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max_value = max(self.max_value, value)
+
+    def percentile(self, percent: float) -> float:
+        """Estimate a percentile as the upper bound of the bucket that contains it."""
+        if self.count == 0:
+            return 0.0
+        rank = percent / 100 * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.bucket_bounds, self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max_value)
+        return self.max_value
+
+    def summary(self) -> Dict[str, float]:
+        """Return the count, mean, p50/p95/p99 and max of the recorded values."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max_value
+        }
+
+
+class SearchProfiler:
+    # Log-spaced latency buckets from 1 microsecond to about 30 seconds (in milliseconds)
+    LATENCY_BUCKETS_MS = [0.001 * 1.25 ** i for i in range(78)]
+    # Candidate count buckets: 0, 1, 2, 4, ... up to about one million documents
+    COUNT_BUCKETS = [0] + [2 ** i for i in range(21)]
+
+    def __init__(self):
+        """Aggregate per-stage timings and candidate counts across searches."""
+        self.timings = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, timings_ms: Dict[str, float], counts: Dict[str, int]) -> None:
+        """Add the timings and counts measured for one search."""
+        with self.lock:
+            for stage, elapsed in timings_ms.items():
+                if stage not in self.timings:
+                    self.timings[stage] = Histogram(self.LATENCY_BUCKETS_MS)
+                self.timings[stage].add(elapsed)
+            for name, value in counts.items():
+                if name not in self.counts:
+                    self.counts[name] = Histogram(self.COUNT_BUCKETS)
+                self.counts[name].add(value)
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Return a summary of every timing (in milliseconds) and count histogram."""
+        with self.lock:
+            return {
+                "timings_ms": {stage: histogram.summary() for stage, histogram in self.timings.items()},
+                "counts": {name: histogram.summary() for name, histogram in self.counts.items()}
+            }
+
+    def reset(self) -> None:
+        """Forget every recorded search."""
+        with self.lock:
+            self.timings.clear()
+            self.counts.clear()
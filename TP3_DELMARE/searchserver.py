@@ -0,0 +1,314 @@
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from productsearchengine import ProductSearchEngine
+from querylogwriter import QueryLogWriter
+
+# Ranking weights accepted by ProductSearchEngine.execute_search, with their defaults
+DEFAULT_WEIGHTS = {
+    "bm25_weight": 0.4,
+    "exact_match_weight": 2.0,
+    "review_weight": 0.3,
+    "title_match_weight": 0.2,
+    "origin_match_weight": 0.1
+}
+SEARCH_MODES = ('any', 'all', 'exact')
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        """Initialize a thread-safe LRU cache whose entries expire after `ttl` seconds."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        """Return the cached value for a key, or None if it is missing or expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple, value: Dict) -> None:
+        """Store a value, evicting the least recently used entries when full."""
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache size and hit/miss counters."""
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+class SearchService:
+    def __init__(self, index_directory: str = "indexs/", data_directory: str = "data/", cache_size: int = 1024,
+                 cache_ttl: float = 300.0, reload_check_interval: float = 2.0,
+                 log_queries: bool = False):
+        """Load the search engine once and serve cached searches to concurrent callers."""
+        self.index_directory = index_directory
+        self.data_directory = data_directory
+        self.log_queries = log_queries
+        self.cache = QueryCache(cache_size, cache_ttl)
+        self.reload_check_interval = reload_check_interval
+        self.reload_lock = threading.Lock()
+        self.last_reload_check = time.monotonic()
+        base_path = os.path.dirname(index_directory.rstrip('/'))
+        # One writer shared by every engine this service loads, so reloads never drop records
+        self.query_log = QueryLogWriter(os.path.join(base_path, "search_results", "queries.jsonl"))
+        self.engine = ProductSearchEngine(index_directory, data_directory, query_log=self.query_log)
+        # Bumped on every reload and part of the cache key, so results of a replaced engine are never served
+        self.generation = 0
+        self.file_signature = self._compute_file_signature()
+        # Signature of files that failed to load, not retried until they change again
+        self.failed_signature = None
+
+    def _watched_files(self) -> List[str]:
+        """List the index and data files the engine is built from."""
+        files = [os.path.join(self.index_directory, name)
+                 for name in sorted(os.listdir(self.index_directory)) if name.endswith(".json")]
+        files.append(f"{self.data_directory}origin_synonyms.json")
+        files.append(f"{self.data_directory}rearranged_products.jsonl")
+        return files
+
+    def _compute_file_signature(self) -> Tuple:
+        """Snapshot the modification time and size of every watched file."""
+        signature = []
+        for path in self._watched_files():
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def _reload_if_changed(self) -> None:
+        """Start a background reload check once the check interval has elapsed."""
+        now = time.monotonic()
+        if now - self.last_reload_check < self.reload_check_interval:
+            return
+        # Requests never wait for a reload: if one is already running, keep serving the current engine
+        if not self.reload_lock.acquire(blocking=False):
+            return
+        self.last_reload_check = now
+        threading.Thread(target=self._reload, name="index-reload", daemon=True).start()
+
+    def _reload(self) -> None:
+        """Reload the engine and invalidate the cache when an index file has changed.
+
+        If the new files cannot be loaded (missing or half-written), the current engine
+        keeps serving and the failure is logged; the same files are not retried.
+        """
+        signature = None
+        try:
+            signature = self._compute_file_signature()
+            if signature == self.file_signature or signature == self.failed_signature:
+                return
+            # Swap in a fully loaded engine so in-flight requests keep a consistent view
+            self.engine = ProductSearchEngine(self.index_directory, self.data_directory,
+                                              query_log=self.query_log)
+            self.generation += 1
+            self.file_signature = signature
+            self.failed_signature = None
+            self.cache.clear()
+        except (OSError, ValueError, KeyError) as e:
+            self.failed_signature = signature
+            logging.error(f"Index reload failed, still serving the previous index: {e}")
+        finally:
+            self.reload_lock.release()
+
+    def _cache_key(self, generation: int, query: str, search_mode: str, weights: Dict[str, float]) -> Tuple:
+        """Build a cache key from the engine generation, lowercased query, search mode and weights.
+
+        The lowercased, stripped query is what the exact match bonus compares, and it
+        also determines the query tokens, so nothing finer can be shared safely.
+        """
+        return (generation, query.lower().strip(), search_mode,
+                tuple(weights[name] for name in DEFAULT_WEIGHTS))
+
+    def search(self, query: str, search_mode: str = 'any', **weights) -> Dict:
+        """Run a single search, answering from the cache when possible."""
+        if not isinstance(query, str):
+            raise ValueError("The query must be a string")
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {search_mode}")
+        unknown = set(weights) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown weights: {', '.join(sorted(unknown))}")
+        weights = {name: float(weights.get(name, default)) for name, default in DEFAULT_WEIGHTS.items()}
+        for name, value in weights.items():
+            if not math.isfinite(value):
+                raise ValueError(f"Weight {name} must be a finite number")
+
+        self._reload_if_changed()
+        # Read the generation before the engine: the reload swaps the engine first, so a
+        # request can pair an old generation with a new engine, never the reverse
+        generation = self.generation
+        engine = self.engine
+        key = self._cache_key(generation, query, search_mode, weights)
+        results = self.cache.get(key)
+        if results is None:
+            results = engine.execute_search(query, search_mode=search_mode, **weights)
+            self.cache.put(key, results)
+
+        # Cached results may come from an equivalent query written differently
+        response = {
+            "metadata": dict(results["metadata"], query=query),
+            "ranked_documents": results["ranked_documents"]
+        }
+        if self.log_queries:
+            self.query_log.log_search(response)
+        return response
+
+    def suggest(self, prefix: str, limit: int = 10, max_typos: int = 0) -> List[Dict]:
+        """Return typeahead completions for a prefix."""
+        self._reload_if_changed()
+        return self.engine.suggest(prefix, limit, max_typos)
+
+    def search_batch(self, requests: List[Dict]) -> List[Dict]:
+        """Run several searches in one call, reporting errors per request."""
+        responses = []
+        for request in requests:
+            try:
+                responses.append(self.search(**request))
+            except (TypeError, ValueError) as e:
+                responses.append({"error": str(e)})
+        return responses
+
+    def close(self) -> None:
+        """Flush the query log."""
+        self.query_log.close()
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    service: SearchService = None
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        """Handle GET /health, /stats, /suggest?q=...&limit=...&typos=... and /search?q=...&mode=...&<weight>=..."""
+        parsed_url = urlparse(self.path)
+        if parsed_url.path == "/health":
+            self._send_json(200, {"status": "ok"})
+            return
+        if parsed_url.path == "/stats":
+            self._send_json(200, {"cache": self.service.cache.stats()})
+            return
+        if parsed_url.path not in ("/search", "/suggest"):
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        params = {key: values[-1] for key, values in parse_qs(parsed_url.query).items()}
+        if parsed_url.path == "/suggest":
+            try:
+                suggestions = self.service.suggest(params.get("q", ""), int(params.get("limit", 10)),
+                                                   int(params.get("typos", 0)))
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(200, {"suggestions": suggestions})
+            return
+
+        query = params.pop("q", None)
+        if query is None:
+            self._send_json(400, {"error": "Missing query parameter 'q'"})
+            return
+        search_mode = params.pop("mode", "any")
+        try:
+            self._send_json(200, self.service.search(query, search_mode, **params))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+
+    def do_POST(self):
+        """Handle POST /search with either a single request object or {"queries": [...]}."""
+        if urlparse(self.path).path != "/search":
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": "Invalid JSON body"})
+            return
+
+        if isinstance(payload, dict) and isinstance(payload.get("queries"), list):
+            self._send_json(200, {"results": self.service.search_batch(payload["queries"])})
+            return
+        if not isinstance(payload, dict) or "query" not in payload:
+            self._send_json(400, {"error": "Expected a 'query' field or a 'queries' list"})
+            return
+        try:
+            self._send_json(200, self.service.search(**payload))
+        except (TypeError, ValueError) as e:
+            self._send_json(400, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        # Keep the console quiet under load; errors are returned to the client
+        pass
+
+
+def create_server(service: SearchService, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    """Create a threaded HTTP server bound to the given service."""
+    handler = type("BoundSearchRequestHandler", (SearchRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve ProductSearchEngine over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--index-directory", default="indexs/")
+    parser.add_argument("--data-directory", default="data/")
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--cache-ttl", type=float, default=300.0)
+    parser.add_argument("--log-queries", action="store_true",
+                        help="Append every served query to search_results/queries.jsonl")
+    args = parser.parse_args()
+
+    search_service = SearchService(args.index_directory, args.data_directory, args.cache_size,
+                                   args.cache_ttl, log_queries=args.log_queries)
+    http_server = create_server(search_service, args.host, args.port)
+    print(f"Serving search on http://{args.host}:{args.port}/search")
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        search_service.close()
@@ -0,0 +1,198 @@
+import heapq
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing.context import BaseContext
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from productsearchengine import ProductSearchEngine, ranking_sort_key
+
+# Engine of the shard loaded in the current worker process
+_shard_engine = None
+
+
+def _load_shard(index_directory: str, data_directory: str) -> None:
+    """Worker initializer: load the shard's indexes once per process."""
+    global _shard_engine
+    _shard_engine = ProductSearchEngine(index_directory, data_directory)
+
+
+def _search_shard(query: str, search_mode: str, top_k: Optional[int], weights: Dict[str, float]) -> Dict:
+    """Run a search against the shard loaded in this worker process."""
+    return _shard_engine.execute_search(query, search_mode=search_mode, top_k=top_k, **weights)
+
+
+def partition_catalog(output_directory: str, num_shards: int,
+                      index_directory: str = "indexs/", data_directory: str = "data/") -> Dict:
+    """Split the catalog into `num_shards` shards, keeping each domain of domain_index.json together.
+
+    Every shard gets its own data and index files plus corpus_statistics.json, which
+    holds the corpus size and document frequencies of the whole catalog so that BM25
+    scores computed on a shard match the single-index ones.
+    """
+    with open(f"{index_directory}domain_index.json", "r") as f:
+        domain_index = json.load(f)
+    product_lines = {}
+    with open(f"{data_directory}rearranged_products.jsonl", "r") as f:
+        for line in f:
+            product_lines[json.loads(line)["url"]] = line
+
+    # Products missing from the domain index are grouped by host name, like the index keys
+    url_domains = {url: domain for domain, urls in domain_index.items() for url in urls}
+    domain_urls = {}
+    for url in product_lines:
+        domain = url_domains.get(url) or re.sub(r'[^a-z0-9]', '', urlparse(url).netloc.lower())
+        domain_urls.setdefault(domain, []).append(url)
+
+    # Greedy balancing: largest domains first, each to the currently smallest shard
+    shards = [{"directory": f"shard_{i}", "domains": [], "urls": set()} for i in range(num_shards)]
+    for domain, urls in sorted(domain_urls.items(), key=lambda item: (-len(item[1]), item[0])):
+        shard = min(shards, key=lambda candidate: len(candidate["urls"]))
+        shard["domains"].append(domain)
+        shard["urls"].update(urls)
+
+    indexes = {}
+    for name in ("title_index", "description_index", "brand_index", "origin_index", "reviews_index"):
+        with open(f"{index_directory}{name}.json", "r") as f:
+            indexes[name] = json.load(f)
+    corpus_statistics = {
+        "corpus_size": len(product_lines),
+        "document_frequencies": {
+            token: len(indexes["title_index"].get(token, {})) + len(indexes["description_index"].get(token, {}))
+            for token in set(indexes["title_index"]) | set(indexes["description_index"])
+        }
+    }
+
+    for shard in shards:
+        shard_directory = os.path.join(output_directory, shard["directory"])
+        os.makedirs(os.path.join(shard_directory, "data"), exist_ok=True)
+        os.makedirs(os.path.join(shard_directory, "indexs"), exist_ok=True)
+        urls = shard["urls"]
+
+        shutil.copy(f"{data_directory}origin_synonyms.json", os.path.join(shard_directory, "data"))
+        with open(os.path.join(shard_directory, "data", "rearranged_products.jsonl"), "w") as f:
+            for url, line in product_lines.items():
+                if url in urls:
+                    f.write(line)
+
+        shard_indexes = {
+            "domain_index": {domain: domain_urls[domain] for domain in shard["domains"]},
+            "reviews_index": {url: data for url, data in indexes["reviews_index"].items() if url in urls},
+            "corpus_statistics": corpus_statistics
+        }
+        for name in ("title_index", "description_index"):
+            shard_indexes[name] = {
+                token: {url: positions for url, positions in postings.items() if url in urls}
+                for token, postings in indexes[name].items()
+            }
+        for name in ("brand_index", "origin_index"):
+            shard_indexes[name] = {
+                token: [url for url in postings if url in urls]
+                for token, postings in indexes[name].items()
+            }
+        for name, index in shard_indexes.items():
+            if name != "corpus_statistics":
+                # Drop tokens with no posting in this shard
+                index = {key: value for key, value in index.items() if value}
+            with open(os.path.join(shard_directory, "indexs", f"{name}.json"), "w") as f:
+                json.dump(index, f, ensure_ascii=False)
+
+    manifest = {
+        "num_shards": num_shards,
+        "shards": [{"directory": shard["directory"], "domains": shard["domains"],
+                    "document_count": len(shard["urls"])} for shard in shards]
+    }
+    with open(os.path.join(output_directory, "shards.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class ShardedSearchEngine:
+    def __init__(self, shard_directory: str, mp_context: Optional[BaseContext] = None):
+        """Start one worker process per non-empty shard listed in shards.json.
+
+        `mp_context` selects how workers are started (e.g. multiprocessing.get_context("spawn")).
+        """
+        with open(os.path.join(shard_directory, "shards.json"), "r") as f:
+            self.manifest = json.load(f)
+
+        self.executors = []
+        for shard in self.manifest["shards"]:
+            if shard["document_count"] == 0:
+                continue
+            directory = os.path.join(shard_directory, shard["directory"])
+            self.executors.append(ProcessPoolExecutor(
+                max_workers=1, mp_context=mp_context, initializer=_load_shard,
+                initargs=(os.path.join(directory, "indexs/"), os.path.join(directory, "data/"))))
+
+    def execute_search(self, query: str, search_mode: str = 'any', top_k: Optional[int] = None,
+                       **weights) -> Dict:
+        """Search every shard in parallel and merge their top_k into a global ranking."""
+        futures = [executor.submit(_search_shard, query, search_mode, top_k, weights)
+                   for executor in self.executors]
+        shard_results = [future.result() for future in futures]
+
+        # Each shard's list is already sorted with the same key, so a k-way merge suffices
+        merged = heapq.merge(*(results["ranked_documents"] for results in shard_results),
+                             key=ranking_sort_key)
+        ranked_documents = list(islice(merged, top_k))
+
+        return {
+            "metadata": {
+                "query": query,
+                "search_mode": search_mode,
+                "document_count": sum(results["metadata"]["document_count"] for results in shard_results)
+            },
+            "ranked_documents": ranked_documents
+        }
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        for executor in self.executors:
+            executor.shutdown()
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    import tempfile
+
+    from benchmark import build_synthetic_catalog
+
+    test_queries = [
+        "Box of Chocolate Candy",
+        "comfortable footbed",
+        "Available in black, red, nude, and silver",
+        "Cat-Ear Beanie america"
+    ]
+
+    with tempfile.TemporaryDirectory() as output_directory:
+        # The real catalog has a single domain, so shard a synthetic copy spread over 8 domains
+        catalog_directory = os.path.join(output_directory, "catalog")
+        build_synthetic_catalog(8, catalog_directory)
+        catalog_index_directory = os.path.join(catalog_directory, "indexs/")
+        catalog_data_directory = os.path.join(catalog_directory, "data/")
+        single_engine = ProductSearchEngine(catalog_index_directory, catalog_data_directory)
+
+        shard_directory = os.path.join(output_directory, "shards")
+        manifest = partition_catalog(shard_directory, 4, catalog_index_directory, catalog_data_directory)
+        for shard in manifest["shards"]:
+            print(f"{shard['directory']}: {shard['document_count']} documents from {', '.join(shard['domains'])}")
+
+        # Spawned workers get their own hash seed, so this also checks rankings do not depend on it
+        sharded_engine = ShardedSearchEngine(shard_directory, multiprocessing.get_context("spawn"))
+        try:
+            for query in test_queries:
+                for search_type in ['all', 'exact', 'any']:
+                    for top_k in [None, 10]:
+                        expected = single_engine.execute_search(query, search_mode=search_type, top_k=top_k)
+                        results = sharded_engine.execute_search(query, search_mode=search_type, top_k=top_k)
+                        assert results == expected, \
+                            f"Sharded results differ from the single index for {query!r} ({search_type}, top_k={top_k})"
+                        print(f"{query!r} ({search_type}, top_k={top_k}): "
+                              f"{results['metadata']['document_count']} documents, identical to single index")
+        finally:
+            sharded_engine.close()